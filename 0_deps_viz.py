@@ -7,21 +7,27 @@ Usage:
   python import_graph.py /path/to/project -o graph.dot
   python import_graph.py . -o graph.dot --format png   # also writes graph.png
   python import_graph.py src -o deps.dot --exclude tests,venv,.venv,build,dist
+  python import_graph.py . -o graph.dot --fast-scan   # regex scan instead of parsing (approximate)
 
-Requires: networkx, pydot (or pygraphviz) to write DOT.
-    pip install networkx pydot
+Requires: rustworkx to build the graph (DOT is written directly).
+    pip install rustworkx
 
 For PNG/SVG rendering you also need Graphviz installed (the `dot` command).
 """
 import argparse
 import ast
+import functools
+import hashlib
+import os
+import marshal
+import re
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Iterable, Set, Tuple, Dict, Optional
+from typing import Iterable, FrozenSet, List, Set, Tuple, Dict, Optional
 
-# For graph building / DOT writing
-import networkx as nx
-from networkx.drawing.nx_pydot import write_dot  # writes Graphviz DOT
+# For graph building
+import rustworkx as rx
 
 
 DEFAULT_EXCLUDES = {
@@ -34,135 +40,321 @@ DEFAULT_EXCLUDES = {
     "tests",
 }
 
+DEFAULT_CACHE_DIR = Path(".import_graph_cache")
+
+# Below this many files, spawning worker processes costs more than it saves
+PARALLEL_MIN_FILES = 50
+
 
 def is_python_file(p: Path) -> bool:
     return p.suffix == ".py" and p.name != "__main__.py"
 
 
-def iter_python_files(root: Path, excludes: Set[str]) -> Iterable[Path]:
-    for p in root.rglob("*.py"):
-        # skip excluded dirs anywhere in path
-        parts = set(p.parts)
-        if parts & excludes:
-            continue
-        yield p
+def _scan(dir_path: str, excludes: Set[str]) -> Iterable[str]:
+    """
+    Recursively yield paths of Python files below `dir_path`.
+    Excluded directories are pruned here, so we never descend into them.
+    Unreadable directories are skipped, as Path.rglob does.
+    """
+    try:
+        with os.scandir(dir_path) as it:
+            for entry in it:
+                if entry.name in excludes:
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    yield from _scan(entry.path, excludes)
+                elif entry.name.endswith(".py") and entry.name != "__main__.py":
+                    yield entry.path
+    except PermissionError:
+        return
+
+
+def iter_python_files(root: Path, excludes: Set[str]) -> Iterable[str]:
+    return _scan(str(root), excludes)
 
 
-def module_name_from_path(project_root: Path, file_path: Path) -> str:
+def module_name_from_path(project_root: Path, file_path: str) -> str:
     """
     Convert a file path to a dotted module name relative to project root.
     e.g., src/pkg/foo/bar.py -> pkg.foo.bar
           src/pkg/foo/__init__.py -> pkg.foo
     """
-    rel = file_path.relative_to(project_root)
-    parts = list(rel.with_suffix("").parts)
+    rel = os.path.relpath(file_path, project_root)
+    parts = os.path.splitext(rel)[0].split(os.sep)
     if parts and parts[-1] == "__init__":
         parts = parts[:-1]
     return ".".join(parts)
 
 
-def resolve_from_import(current_module: str, imported_module: Optional[str], level: int) -> str:
+@functools.lru_cache(maxsize=None)
+def resolve_from_import(current_parts: Tuple[str, ...], imported_module: Optional[str], level: int) -> str:
     """
     Resolve a 'from ... import ...' to an absolute dotted module, given
     the current module and relative level.
 
-    current_module: e.g., 'pkg.sub.module' or 'pkg.sub' (for __init__.py)
+    current_parts: the current module split on '.', e.g., ('pkg', 'sub', 'module')
+                   or ('pkg', 'sub') (for __init__.py); () for a top-level __init__.py
     imported_module: e.g., 'utils' in 'from . import utils', or 'x.y' in 'from ..x.y import z'
     level: number of leading dots in the import (0 for absolute)
     """
     if level == 0:
         return imported_module or ""
-    base_parts = current_module.split(".")
-    # If current_module refers to a module (file) not a package, trim last part to get its package
-    # Heuristic: if the current_module had no __init__.py name, we treat it as a module; drop last segment
+    # If current module refers to a module (file) not a package, trim last part to get its package
+    # Heuristic: if the current module had no __init__.py name, we treat it as a module; drop last segment
     # This works with our module_name_from_path that omits '__init__'
-    if current_module:
-        base_parts = base_parts[:-1] if base_parts else base_parts
+    base_parts = current_parts[:-1]
     # Walk up 'level - 1' additional parents after moving to the package
     up = max(level - 1, 0)
     if up:
-        base_parts = base_parts[:-up] if up <= len(base_parts) else []
+        base_parts = base_parts[:-up] if up <= len(base_parts) else ()
     if imported_module:
-        return ".".join([p for p in base_parts if p] + imported_module.split("."))
-    return ".".join([p for p in base_parts if p])
+        return ".".join(base_parts + tuple(imported_module.split(".")))
+    return ".".join(base_parts)
 
 
-def collect_imports_for_file(py_file: Path, project_root: Path) -> Set[str]:
+class _ImportVisitor(ast.NodeVisitor):
+    """
+    Collects imported module names while only descending into statement
+    bodies (if/try/with/...), never into expressions.
+    Function and class bodies are skipped unless `inline_imports` is set.
+    """
+
+    # Fields holding nested statements (ExceptHandler and match_case carry a 'body' too)
+    STATEMENT_FIELDS = ("body", "orelse", "finalbody", "handlers", "cases")
+
+    def __init__(self, current_module: str, inline_imports: bool = False):
+        self.current_parts: Tuple[str, ...] = tuple(current_module.split(".")) if current_module else ()
+        self.inline_imports = inline_imports
+        self.found: Set[str] = set()
+
+    def visit_Import(self, node: ast.Import):
+        # import a.b as x, import c
+        for alias in node.names:
+            if alias.name:
+                self.found.add(alias.name)
+
+    def visit_ImportFrom(self, node: ast.ImportFrom):
+        # from .a.b import c, from .. import d
+        mod = node.module  # may be None for 'from . import x'
+        level = getattr(node, "level", 0) or 0
+        abs_mod = resolve_from_import(self.current_parts, mod, level)
+        if abs_mod:
+            self.found.add(abs_mod)
+        # also consider specific names as submodules (from pkg import submodule)
+        for alias in node.names:
+            if alias.name == "*":
+                continue
+            name_as_module = abs_mod + "." + alias.name if abs_mod else alias.name
+            # Add both the container module and the potential submodule path
+            self.found.add(name_as_module)
+
+    def visit_FunctionDef(self, node):
+        if self.inline_imports:
+            self.generic_visit(node)
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+    visit_ClassDef = visit_FunctionDef
+
+    def generic_visit(self, node: ast.AST):
+        for field in self.STATEMENT_FIELDS:
+            for child in getattr(node, field, ()):
+                self.visit(child)
+
+
+def cached_imports(fn):
+    """
+    Persist the imports extracted by `fn` on disk, one marshal file per source file
+    (only the sorted list of module names is stored, which loads faster than a pickle).
+    An entry is reused as long as the extractor, the file's mtime and size, the Python
+    version, the project root and the extra arguments of `fn` are unchanged.
+    Caching is disabled when no `cache_dir` is passed.
+    """
+    @functools.wraps(fn)
+    def wrapper(py_file: str, project_root: Path, *args, cache_dir: Optional[Path] = None) -> Set[str]:
+        if cache_dir is None:
+            return fn(py_file, project_root, *args)
+
+        st = os.stat(py_file)
+        key = (fn.__name__, st.st_mtime_ns, st.st_size, sys.version_info[:2], str(project_root), args)
+        abs_path = os.path.abspath(py_file)
+        entry = cache_dir / hashlib.blake2b(abs_path.encode()).hexdigest()[:16]
+        try:
+            with open(entry, "rb") as f:
+                stored_key, imports = marshal.load(f)
+            if stored_key == key:
+                return set(imports)
+        except (OSError, EOFError, ValueError, TypeError):
+            pass
+
+        imports = fn(py_file, project_root, *args)
+        # Writing the cache is best-effort (e.g. read-only working directory, full disk)
+        try:
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            with open(entry, "wb") as f:
+                marshal.dump((key, sorted(imports)), f)
+        except OSError:
+            pass
+        return imports
+
+    return wrapper
+
+
+@cached_imports
+def collect_imports_for_file(py_file: str, project_root: Path, inline_imports: bool = False) -> Set[str]:
     """
     Return a set of (absolute) module names imported by this file.
     Only returns the top-level module path delivered by the import statement
     (e.g., importing 'pkg.sub.mod' yields 'pkg.sub.mod').
+    Imports inside functions and classes are only considered with `inline_imports`.
     """
-    text = py_file.read_text(encoding="utf-8")
+    # Parse the raw bytes so the compiler decodes them itself (honouring PEP 263 coding cookies)
+    with open(py_file, "rb") as f:
+        raw = f.read()
     try:
-        tree = ast.parse(text, filename=str(py_file))
-    except SyntaxError:
+        tree = ast.parse(raw, filename=py_file)
+    except (SyntaxError, ValueError):  # ValueError: null bytes in the source
         return set()
 
+    visitor = _ImportVisitor(module_name_from_path(project_root, py_file), inline_imports)
+    for stmt in tree.body:
+        visitor.visit(stmt)
+    return visitor.found
+
+
+@functools.lru_cache(maxsize=None)
+def normalize_to_project(mod: str, project_set: FrozenSet[str]) -> Optional[str]:
+    """
+    If `mod` refers to a module/package under the project (i.e. it or one of
+    its dotted parents is a project module), return it; else None.
+    """
+    cur = mod
+    while cur:
+        if cur in project_set:
+            return mod  # keep full path inside the project
+        i = cur.rfind(".")
+        if i < 0:
+            return None
+        cur = cur[:i]
+    return None
+
+
+# Import statements on physical lines: group 1/2 = module and names of 'from ... import ...',
+# group 3 = names of 'import ...'
+IMPORT_RE = re.compile(
+    rb'^[ \t]*(?:from[ \t]+([.\w]+)[ \t]+import[ \t]+\(?([\w, \t]*)|import[ \t]+([\w., \t]+))', re.M
+)
+
+
+@cached_imports
+def collect_imports_regex(py_file: str, project_root: Path) -> Set[str]:
+    """
+    Approximate `collect_imports_for_file` with a regex scan instead of parsing.
+    Much faster, but it misses continuation lines of parenthesized imports and may
+    pick up import statements inside strings; good enough for a visualization.
+    """
+    with open(py_file, "rb") as f:
+        data = f.read()
+
     current_module = module_name_from_path(project_root, py_file)
+    current_parts: Tuple[str, ...] = tuple(current_module.split(".")) if current_module else ()
     found: Set[str] = set()
 
-    for node in ast.walk(tree):
-        if isinstance(node, ast.Import):
-            # import a.b as x, import c
-            for alias in node.names:
-                if alias.name:
-                    found.add(alias.name)
-        elif isinstance(node, ast.ImportFrom):
+    for m in IMPORT_RE.finditer(data):
+        from_mod, from_names, import_names = m.groups()
+        if from_mod is not None:
             # from .a.b import c, from .. import d
-            mod = node.module  # may be None for 'from . import x'
-            level = getattr(node, "level", 0) or 0
-            abs_mod = resolve_from_import(current_module, mod, level)
+            from_mod = from_mod.decode()
+            mod = from_mod.lstrip(".")
+            level = len(from_mod) - len(mod)
+            abs_mod = resolve_from_import(current_parts, mod or None, level)
             if abs_mod:
                 found.add(abs_mod)
             # also consider specific names as submodules (from pkg import submodule)
-            for alias in node.names:
-                if alias.name == "*":
-                    continue
-                name_as_module = abs_mod + "." + alias.name if abs_mod else alias.name
-                # Add both the container module and the potential submodule path
-                found.add(name_as_module)
+            for name in from_names.decode().split(","):
+                words = name.split()  # 'c as x' -> ['c', 'as', 'x']
+                if words:
+                    found.add(abs_mod + "." + words[0] if abs_mod else words[0])
+        else:
+            # import a.b as x, import c
+            for name in import_names.decode().split(","):
+                words = name.split()
+                if words:
+                    found.add(words[0])
 
     return found
 
 
-def normalize_to_project(mod: str, project_modules: Set[str]) -> Optional[str]:
+def _worker(args: Tuple[str, Path, bool, bool, Optional[Path]]) -> Tuple[str, Set[str]]:
     """
-    If `mod` refers to a module/package under the project, return the
-    *deepest* matching project module prefix; else None.
+    Process pool entry point: extract the imports of a single file.
     """
-    # Try longest-prefix match so 'mypkg.sub.mod' matches 'mypkg.sub.mod' first, then 'mypkg.sub', then 'mypkg'
-    candidates = sorted(project_modules, key=len, reverse=True)
-    for cand in candidates:
-        if mod == cand or mod.startswith(cand + "."):
-            return mod  # keep full path inside the project
-    return None
+    py_file, project_root, inline_imports, fast_scan, cache_dir = args
+    if fast_scan:
+        imports = collect_imports_regex(py_file, project_root, cache_dir=cache_dir)
+    else:
+        imports = collect_imports_for_file(py_file, project_root, inline_imports, cache_dir=cache_dir)
+    return module_name_from_path(project_root, py_file), imports
 
 
-def build_graph(project_root: Path, excludes: Set[str]) -> Tuple[nx.DiGraph, Set[str]]:
+def build_graph(project_root: Path, excludes: Set[str], inline_imports: bool = False,
+                cache_dir: Optional[Path] = None, fast_scan: bool = False) -> Tuple[rx.PyDiGraph, Set[str]]:
     """
     Build a DiGraph of internal module -> internal module edges.
     Returns graph and the set of discovered project module names.
     """
     project_root = project_root.resolve()
     files = list(iter_python_files(project_root, excludes))
-    module_of: Dict[Path, str] = {f: module_name_from_path(project_root, f) for f in files}
+    module_of: Dict[str, str] = {f: module_name_from_path(project_root, f) for f in files}
 
     # Project modules are every module we found (files and packages)
     project_modules: Set[str] = set(module_of.values())
 
-    G = nx.DiGraph()
-    G.add_nodes_from(project_modules)
-
-    for f, modname in module_of.items():
-        imports = collect_imports_for_file(f, project_root)
-        for target in imports:
-            internal = normalize_to_project(target, project_modules)
-            if internal and internal != modname:
-                G.add_edge(modname, internal)
+    G = rx.PyDiGraph(multigraph=False)
+    index: Dict[str, int] = {m: G.add_node(m) for m in project_modules}
+    project_set = frozenset(project_modules)
+
+    # Parsing is pure per file, so it is spread across processes; the graph is assembled here
+    tasks = [(f, project_root, inline_imports, fast_scan, cache_dir) for f in files]
+    if len(tasks) < PARALLEL_MIN_FILES:
+        results = list(map(_worker, tasks))
+    else:
+        n_workers = os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=n_workers) as ex:
+            results = list(ex.map(_worker, tasks, chunksize=max(1, len(tasks) // (n_workers * 4))))
+
+    # Sibling files often share the exact same imports; resolve each distinct set only once
+    resolved_cache: Dict[FrozenSet[str], List[str]] = {}
+    for modname, imports in results:
+        key = frozenset(imports)
+        internals = resolved_cache.get(key)
+        if internals is None:
+            internals = [internal for internal in (normalize_to_project(t, project_set) for t in key) if internal]
+            resolved_cache[key] = internals
+        for internal in internals:
+            # `internal` may be a name inside a module (from pkg.mod import Cls), add it on first use
+            if internal not in index:
+                index[internal] = G.add_node(internal)
+        G.add_edges_from_no_data([(index[modname], index[i]) for i in internals if i != modname])
     return G, project_modules
 
 
+def write_dot(G: rx.PyDiGraph, path: Path) -> None:
+    """
+    Stream the module graph as Graphviz DOT; node payloads are the module names.
+    The node style is declared once as a graph default instead of per node.
+    """
+    # Quote each name once, indexed by node index, and reuse it for every edge
+    quoted = {i: '"' + G[i].replace("\\", "\\\\").replace('"', '\\"') + '"' for i in G.node_indices()}
+    with open(path, "w", buffering=1 << 20) as f:
+        f.write("digraph G {\n")
+        f.write("  node [shape=box,style=rounded];\n")
+        for name in quoted.values():
+            f.write(f"  {name};\n")
+        for a, b in G.edge_list():
+            f.write(f"  {quoted[a]} -> {quoted[b]};\n")
+        f.write("}\n")
+
+
 def render_with_graphviz(dot_path: Path, fmt: str) -> Optional[Path]:
     """
     If Graphviz 'dot' is installed, render to the requested format (png/svg/pdf).
@@ -188,6 +380,15 @@ def main(argv: Iterable[str]) -> int:
                     help="Also render to this format if Graphviz is installed.")
     ap.add_argument("--exclude", type=str, default="",
                     help="Comma-separated names of directories to exclude (in addition to sensible defaults).")
+    ap.add_argument("--inline-imports", action="store_true",
+                    help="Also follow imports inside function and class bodies.")
+    ap.add_argument("--cache-dir", type=Path, default=DEFAULT_CACHE_DIR,
+                    help=f"Directory for cached per-file imports (default: {DEFAULT_CACHE_DIR})")
+    ap.add_argument("--no-cache", action="store_true",
+                    help="Re-parse every file instead of using the import cache.")
+    ap.add_argument("--fast-scan", action="store_true",
+                    help="Find imports with a regex instead of parsing each file (much faster, approximate; "
+                         "always includes inline imports).")
     args = ap.parse_args(list(argv))
 
     excludes = set(DEFAULT_EXCLUDES)
@@ -198,15 +399,15 @@ def main(argv: Iterable[str]) -> int:
     if not root.exists():
         print(f"Error: {root} does not exist.", file=sys.stderr)
         return 2
+    if not root.is_dir():
+        print(f"Error: {root} is not a directory.", file=sys.stderr)
+        return 2
 
-    G, project_modules = build_graph(root, excludes)
-
-    # Basic styling hints (Graphviz will ignore unknown attrs in DOT)
-    for n in G.nodes:
-        G.nodes[n]["shape"] = "box"
-        G.nodes[n]["style"] = "rounded"
+    G, project_modules = build_graph(root, excludes, args.inline_imports,
+                                    cache_dir=None if args.no_cache else args.cache_dir,
+                                    fast_scan=args.fast_scan)
 
-    write_dot(G, str(args.output))
+    write_dot(G, args.output)
 
     print(f"Wrote DOT file: {args.output}")
     if args.format:
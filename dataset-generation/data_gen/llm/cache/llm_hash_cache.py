@@ -1,7 +1,16 @@
+import json
 import sqlite3
-from os import makedirs
+from os import getenv, makedirs
 from os.path import exists, join
-from typing import Dict
+from typing import Dict, List, Union
+
+try:
+    import orjson
+except ImportError:  # optional, only speeds up serializing stored queries
+    orjson = None
+
+# Set LLM_CACHE_STORE_PAYLOAD=0 to only keep hashes and results (the query column stays empty)
+STORE_PAYLOAD: bool = getenv("LLM_CACHE_STORE_PAYLOAD", "1") != "0"
 
 
 class LLMHashCache:
@@ -59,7 +68,15 @@ class LLMHashCache:
         row = cursor.fetchone()
         return row[0] if row else None
 
-    def add_result(self, query_hash: str, query: str, result: str, llm: str) -> None:
+    def add_result(self, query_hash: str, query: Union[str, List[Dict]], result: str, llm: str) -> None:
+        """
+        :param query    The query as a string, or the list of messages. Messages are only
+                        serialized (with orjson if installed) if payloads are stored.
+        """
+        if not STORE_PAYLOAD:
+            query = None
+        elif not isinstance(query, str):
+            query = orjson.dumps(query).decode() if orjson is not None else json.dumps(query)
         with self.conn:
             self.conn.execute('''
                 INSERT OR REPLACE INTO query_cache (query_hash, llm, query, result)
@@ -1,19 +1,77 @@
+import asyncio
+import os
 from typing import Dict, List, Tuple
 
+from data_gen.util.misc import hash_messages
+
 
 class BaseLLMWrapper:
 
     def __init__(self):
         self.count_queries: int = 0
 
+        # Max. number of requests in flight during `batch_query`
+        self.concurrency: int = int(os.getenv("LLM_CONCURRENCY", "16"))
+        self._async_loop = None
+        self._semaphore = None
+        self.async_client = None
+
     def query(self, system_prompt: str, prompt: str) -> Dict:
         raise NotImplementedError()
 
+    async def aquery(self, system_prompt: str, prompt: str) -> Dict:
+        raise NotImplementedError()
+
+    def create_async_client(self):
+        raise NotImplementedError()
+
     def get_info(self) -> Dict:
         raise NotImplementedError()
 
     def query_history(self, system_prompt: str, prompt: str, history: List[Tuple[str, str]]) -> Dict:
         raise NotImplementedError()
 
+    def get_async_client(self):
+        """
+        Returns the async client and the semaphore bounding concurrent requests. Both are tied to
+        the running event loop, so they are recreated whenever a new loop is used (e.g. per `batch_query`).
+        """
+        loop = asyncio.get_running_loop()
+        if self._async_loop is not loop:
+            self._async_loop = loop
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self.async_client = self.create_async_client()
+        return self.async_client, self._semaphore
+
+    @staticmethod
+    def _batch_key(prompt: str, system_prompt: str) -> str:
+        return hash_messages([{"role": "user", "content": prompt}], system_prompt=system_prompt or None)
+
+    def batch_query(self, prompts: List[str], system_prompt: str = '') -> List[str]:
+        """
+        Queries all prompts concurrently (at most `concurrency` at a time) and returns the
+        responses in the order of the prompts. Duplicate prompts are only queried once.
+        """
+        unique_prompts: Dict[str, str] = {}
+        for prompt in prompts:
+            unique_prompts.setdefault(self._batch_key(prompt, system_prompt), prompt)
+
+        async def run() -> Dict[str, str]:
+            try:
+                results: List[Dict] = await asyncio.gather(*[
+                    self.aquery(system_prompt, prompt) for prompt in unique_prompts.values()
+                ])
+            finally:
+                # The client is bound to this loop, close its connection pool before the loop ends
+                if self.async_client is not None:
+                    await self.async_client.close()
+                self._async_loop = None
+                self._semaphore = None
+                self.async_client = None
+            return {messages_hash: result['response'] for messages_hash, result in zip(unique_prompts, results)}
+
+        responses: Dict[str, str] = asyncio.run(run())
+        return [responses[self._batch_key(prompt, system_prompt)] for prompt in prompts]
+
     def reset_query_count(self):
-        self.count_queries: int = 0
\ No newline at end of file
+        self.count_queries: int = 0
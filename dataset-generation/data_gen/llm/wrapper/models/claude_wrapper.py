@@ -1,4 +1,3 @@
-import json
 import os
 from datetime import datetime
 from typing import Dict, List, Tuple
@@ -54,7 +53,7 @@ class ClaudeWrapper(BaseLLMWrapper):
                 max_gen_len=self.max_tokens,
                 temperature=self.temperature
             )
-            self.cache.add_result(messages_hash, json.dumps(messages), response, self.model)
+            self.cache.add_result(messages_hash, messages, response, self.model)
 
         response: str = self.cache.get_result(messages_hash, self.model)
         return {
@@ -78,7 +77,7 @@ class ClaudeWrapper(BaseLLMWrapper):
                 max_gen_len=self.max_tokens,
                 temperature=self.temperature
             )
-            self.cache.add_result(messages_hash, json.dumps(messages), response, self.model)
+            self.cache.add_result(messages_hash, messages, response, self.model)
 
         response: str = self.cache.get_result(messages_hash, self.model)
         return {
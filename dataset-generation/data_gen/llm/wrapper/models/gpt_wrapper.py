@@ -1,4 +1,3 @@
-import json
 import time
 from typing import Dict, List, Tuple
 
@@ -35,7 +34,7 @@ class GPTWrapper(BaseLLMWrapper):
                 max_gen_len=self.max_tokens,
                 temperature=self.temperature
             )
-            self.cache.add_result(messages_hash, json.dumps(messages), response, self.model)
+            self.cache.add_result(messages_hash, messages, response, self.model)
 
         response: str = self.cache.get_result(messages_hash, self.model)
         return {
@@ -59,7 +58,7 @@ class GPTWrapper(BaseLLMWrapper):
                 max_gen_len=self.max_tokens,
                 temperature=self.temperature
             )
-            self.cache.add_result(messages_hash, json.dumps(messages), response, self.model)
+            self.cache.add_result(messages_hash, messages, response, self.model)
 
         response: str = self.cache.get_result(messages_hash, self.model)
         return {
@@ -1,17 +1,34 @@
-import json
+import atexit
+import asyncio
 import time
 import os
 from typing import Dict, List, Tuple
 from datetime import datetime
 
 import openai
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 
 from data_gen.llm.cache.llm_hash_cache import LLMHashCache, LLMCachePool
 from data_gen.llm.wrapper.base_llm_wrapper import BaseLLMWrapper
 from data_gen.util.misc import hash_messages
 
 
+# Raw responses are only appended to DEBUG_LOG_FILE if NEOQA_LLM_DEBUG is set
+DEBUG_LOG_FILE: str = "temp2.txt"
+_debug_fh = None
+
+
+def _debug_log(content: str) -> None:
+    global _debug_fh
+    if _debug_fh is None:
+        _debug_fh = open(DEBUG_LOG_FILE, "a", buffering=1 << 16)
+        atexit.register(_debug_fh.close)
+    timestamp_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    _debug_fh.write(timestamp_str + "\n\n")
+    _debug_fh.write(content)
+    _debug_fh.write("\n\n===========================================================================\n\n")
+
+
 class OPENROUTERWrapper(BaseLLMWrapper):
 
     def __init__(self, model_version: str = "openai/gpt-oss-safeguard-20b", temperature: float = 0.0,
@@ -23,9 +40,12 @@ class OPENROUTERWrapper(BaseLLMWrapper):
         self.max_tokens: int = max_tokens
         self.cache: LLMHashCache = LLMCachePool.get(temperature, max_tokens)
         
-        api_key = os.getenv("OPENROUTER_API_KEY")
-        base_url = "https://openrouter.ai/api/v1"
-        self.client = OpenAI(api_key=api_key, base_url=base_url)
+        self.api_key = os.getenv("OPENROUTER_API_KEY")
+        self.base_url = "https://openrouter.ai/api/v1"
+        self.client = OpenAI(api_key=self.api_key, base_url=self.base_url)
+
+    def create_async_client(self) -> AsyncOpenAI:
+        return AsyncOpenAI(api_key=self.api_key, base_url=self.base_url)
 
     def query(self, system_prompt: str, user_prompt: str, format_prompt: str = "chat") -> Dict:
         self.count_queries += 1
@@ -40,7 +60,28 @@ class OPENROUTERWrapper(BaseLLMWrapper):
                 max_gen_len=self.max_tokens,
                 temperature=self.temperature
             )
-            self.cache.add_result(messages_hash, json.dumps(messages), response, self.model)
+            self.cache.add_result(messages_hash, messages, response, self.model)
+
+        response: str = self.cache.get_result(messages_hash, self.model)
+        return {
+            'model_dump': None,
+            'response': response
+        }
+
+    async def aquery(self, system_prompt: str, user_prompt: str) -> Dict:
+        self.count_queries += 1
+
+        messages: List[Dict] = [{"role": "user", "content": user_prompt}]
+        # An empty system prompt hashes like `query`, so both share cache entries
+        messages_hash: str = hash_messages(messages, system_prompt=system_prompt or None)
+
+        if not self.cache.has_hash(messages_hash, self.model):
+            response: str = await self.ainvoke_model_with_messages(
+                system_prompt=system_prompt or "", messages=messages,
+                max_gen_len=self.max_tokens,
+                temperature=self.temperature
+            )
+            self.cache.add_result(messages_hash, messages, response, self.model)
 
         response: str = self.cache.get_result(messages_hash, self.model)
         return {
@@ -64,7 +105,7 @@ class OPENROUTERWrapper(BaseLLMWrapper):
                 max_gen_len=self.max_tokens,
                 temperature=self.temperature
             )
-            self.cache.add_result(messages_hash, json.dumps(messages), response, self.model)
+            self.cache.add_result(messages_hash, messages, response, self.model)
 
         response: str = self.cache.get_result(messages_hash, self.model)
         return {
@@ -107,12 +148,8 @@ class OPENROUTERWrapper(BaseLLMWrapper):
                     temperature=temperature,
                     max_tokens=max_gen_len
                 )
-                with open("temp2.txt", "a") as f:
-                    timestamp_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    f.write(timestamp_str + "\n\n")
-                    f.write(response.choices[0].message.content)
-                    f.write("\n\n===========================================================================\n\n")
-                    f.close()
+                if os.getenv("NEOQA_LLM_DEBUG"):
+                    _debug_log(response.choices[0].message.content)
                 return response.choices[0].message.content
             except openai.RateLimitError as err:
                 print('Ratelimit Error')
@@ -127,3 +164,34 @@ class OPENROUTERWrapper(BaseLLMWrapper):
                 print(err)
         raise ValueError('Ratelimit exceeded too many times!')
 
+    async def ainvoke_model_with_messages(self, system_prompt, messages: List[Dict], max_gen_len=512, temperature: float=0., max_attempts=10):
+        client, semaphore = self.get_async_client()
+        if system_prompt is not None and len(system_prompt.strip()) > 0:
+            messages = [{'role': 'system', 'content': system_prompt}] + messages
+
+        attempts: int = 0
+        last_err = None
+        while attempts < max_attempts:
+            attempts += 1
+            try:
+                async with semaphore:
+                    response = await client.chat.completions.create(
+                        model=self.model,
+                        messages=messages,
+                        temperature=temperature,
+                        max_tokens=max_gen_len
+                    )
+                if os.getenv("NEOQA_LLM_DEBUG"):
+                    _debug_log(response.choices[0].message.content)
+                return response.choices[0].message.content
+            except openai.RateLimitError as err:
+                print('Ratelimit Error')
+                print(f"Error on attempt {attempts}/{max_attempts}")
+                print(err)
+                print('Sleeping for 5 seconds.')
+                await asyncio.sleep(5)
+            except Exception as err:
+                last_err = err
+                print(f"Error on attempt {attempts}/{max_attempts}")
+                print(err)
+        raise ValueError(str(last_err) if last_err else 'Ratelimit exceeded too many times!')
@@ -1,10 +1,10 @@
-import json
+import asyncio
 import time
 from typing import Dict, List, Tuple
 import os
 
 import openai
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 
 from data_gen.llm.cache.llm_hash_cache import LLMHashCache, LLMCachePool
 from data_gen.llm.wrapper.base_llm_wrapper import BaseLLMWrapper
@@ -23,11 +23,13 @@ class VLLMWrapper(BaseLLMWrapper):
         self.cache = LLMCachePool.get(temperature, max_tokens)
 
         # NEW: allow local OpenAI-compatible servers
-        print(base_url or os.getenv("OPENAI_BASE_URL") or None)
-        self.client = OpenAI(
-            base_url=base_url or os.getenv("OPENAI_BASE_URL") or None,
-            api_key=api_key or os.getenv("OPENAI_API_KEY") or "not-needed"
-        )
+        self.base_url = base_url or os.getenv("OPENAI_BASE_URL") or None
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY") or "not-needed"
+        print(self.base_url)
+        self.client = OpenAI(base_url=self.base_url, api_key=self.api_key)
+
+    def create_async_client(self) -> AsyncOpenAI:
+        return AsyncOpenAI(base_url=self.base_url, api_key=self.api_key)
 
     def query(self, system_prompt: str, user_prompt: str, format_prompt: str = "chat") -> Dict:
         self.count_queries += 1
@@ -42,7 +44,28 @@ class VLLMWrapper(BaseLLMWrapper):
                 max_gen_len=self.max_tokens,
                 temperature=self.temperature
             )
-            self.cache.add_result(messages_hash, json.dumps(messages), response, self.model)
+            self.cache.add_result(messages_hash, messages, response, self.model)
+
+        response: str = self.cache.get_result(messages_hash, self.model)
+        return {
+            'model_dump': None,
+            'response': response
+        }
+
+    async def aquery(self, system_prompt: str, user_prompt: str) -> Dict:
+        self.count_queries += 1
+
+        messages: List[Dict] = [{"role": "user", "content": user_prompt}]
+        # An empty system prompt hashes like `query`, so both share cache entries
+        messages_hash: str = hash_messages(messages, system_prompt=system_prompt or None)
+
+        if not self.cache.has_hash(messages_hash, self.model):
+            response: str = await self.ainvoke_model_with_messages(
+                system_prompt=system_prompt or "", messages=messages,
+                max_gen_len=self.max_tokens,
+                temperature=self.temperature
+            )
+            self.cache.add_result(messages_hash, messages, response, self.model)
 
         response: str = self.cache.get_result(messages_hash, self.model)
         return {
@@ -66,7 +89,7 @@ class VLLMWrapper(BaseLLMWrapper):
                 max_gen_len=self.max_tokens,
                 temperature=self.temperature
             )
-            self.cache.add_result(messages_hash, json.dumps(messages), response, self.model)
+            self.cache.add_result(messages_hash, messages, response, self.model)
 
         response: str = self.cache.get_result(messages_hash, self.model)
         return {
@@ -82,11 +105,12 @@ class VLLMWrapper(BaseLLMWrapper):
             'max-tokens': self.max_tokens
         }
 
-    def invoke_model_with_messages(self, system_prompt, messages: List[Dict], max_gen_len=512, temperature: float=0.):
+    def invoke_model_with_messages(self, system_prompt, messages: List[Dict], max_gen_len=512, temperature: float=0., max_attempts=10):
 
         attempts: int = 0
+        last_err = None
 
-        while attempts < 10:
+        while attempts < max_attempts:
             attempts += 1
             try:
                 new_messages = []
@@ -109,8 +133,10 @@ class VLLMWrapper(BaseLLMWrapper):
                     temperature=temperature,
                     max_tokens=max_gen_len
                 )
+                return response.choices[0].message.content
             except openai.RateLimitError as err:
                 print('Ratelimit Error')
+                print(f"Error on attempt {attempts}/{max_attempts}")
                 print(err)
                 print('Sleeping for 5 seconds.')
                 time.sleep(5)
@@ -119,5 +145,34 @@ class VLLMWrapper(BaseLLMWrapper):
                 last_err = err
                 print(f"Error on attempt {attempts}/{max_attempts}")
                 print(err)
-        raise ValueError('Ratelimit exceeded too many times!')
+        raise ValueError(str(last_err) if last_err else 'Ratelimit exceeded too many times!')
 
+    async def ainvoke_model_with_messages(self, system_prompt, messages: List[Dict], max_gen_len=512, temperature: float=0., max_attempts=10):
+        client, semaphore = self.get_async_client()
+        if system_prompt is not None and len(system_prompt.strip()) > 0:
+            messages = [{'role': 'system', 'content': system_prompt}] + messages
+
+        attempts: int = 0
+        last_err = None
+        while attempts < max_attempts:
+            attempts += 1
+            try:
+                async with semaphore:
+                    response = await client.chat.completions.create(
+                        model=self.model,
+                        messages=messages,
+                        temperature=temperature,
+                        max_tokens=max_gen_len
+                    )
+                return response.choices[0].message.content
+            except openai.RateLimitError as err:
+                print('Ratelimit Error')
+                print(f"Error on attempt {attempts}/{max_attempts}")
+                print(err)
+                print('Sleeping for 5 seconds.')
+                await asyncio.sleep(5)
+            except Exception as err:
+                last_err = err
+                print(f"Error on attempt {attempts}/{max_attempts}")
+                print(err)
+        raise ValueError(str(last_err) if last_err else 'Ratelimit exceeded too many times!')
@@ -1,8 +1,14 @@
 #!/usr/bin/env python3
 import os
-import re
 import sys
 
+# RE2 (pip install google-re2) matches in linear time, so long tooltips cannot trigger
+# catastrophic backtracking; the stdlib engine is used if it is not installed
+try:
+    import re2 as re
+except ImportError:
+    import re
+
 """
 Usage:
   python filter_dot_project.py <input.dot> <output.dot> <project_root>
@@ -17,96 +23,68 @@ if len(sys.argv) != 4:
     print("Usage: filter_dot_project.py <input.dot> <output.dot> <project_root>")
     sys.exit(1)
 
-in_dot, out_dot, project_root = sys.argv[1], sys.argv[2], os.path.abspath(sys.argv[3])
+in_dot, out_dot = sys.argv[1], sys.argv[2]
+# trailing separator (added only if missing, e.g. not for '/') so that '/proj' does not also match '/project2'
+project_root = os.fsencode(os.path.join(os.path.normpath(os.path.abspath(sys.argv[3])), ''))
 
 # regex to match node definitions with tooltip
-node_re = re.compile(r'^\s*(?P<id>\d+)\s+\[.*tooltip="(?P<tooltip>[^"]+)"(?:.*label="(?P<label>[^"]+)")?')
-edge_re = re.compile(r'^\s*(?P<src>\d+)\s*->\s*(?P<dst>\d+)')
+node_re = re.compile(rb'^\s*(?P<id>\d+)\s+\[.*tooltip="(?P<tooltip>[^"]+)"(?:.*label="(?P<label>[^"]+)")?')
+edge_re = re.compile(rb'^\s*(?P<src>\d+)\s*->\s*(?P<dst>\d+)')
 
 # Patterns for exclusion: e.g. frozen importlib, builtins, etc.
 EXCLUDE_PATTERNS = [
-    re.compile(r'<frozen importlib'),   # exclude nodes from frozen importlib
-    re.compile(r'\~'),   # exclude nodes from method
+    re.compile(rb'<frozen importlib'),   # exclude nodes from frozen importlib
+    re.compile(rb'\~'),   # exclude nodes from method
     # add more patterns here if needed
 ]
+# All exclusion patterns as one alternation, so each node needs a single search
+EXCLUDE_RE = re.compile(b'|'.join(b'(?:' + p.pattern + b')' for p in EXCLUDE_PATTERNS))
 
-keep_nodes = {}
-raw_edges = []
-header = []
-footer = []
+keep_nodes = set()
+edges = []
+other_lines = []
 in_body = False
+n_edges = 0
 
-with open(in_dot, 'r') as f:
-    lines = f.readlines()
-
-# separate header (before first node/edge), body (nodes & edges), footer (if any)
-for line in lines:
-    if not in_body:
-        if node_re.match(line) or edge_re.match(line):
+# Single pass over the input: header lines (before the first node/edge) and kept
+# nodes are written as they are read; edges are buffered until all nodes are known.
+with open(in_dot, 'rb') as f_in, open(out_dot, 'wb') as f_out:
+    for line in f_in:
+        m = node_re.match(line)
+        if m:
             in_body = True
-            # but also this line belongs to body; continue processing it below
-        else:
-            header.append(line)
+            # positional groups: re2 names bytes groups with bytes keys, the stdlib with str keys
+            node_id, tooltip, label = m.groups()
+            label = label or b""
+            # normalize tooltip path
+            abs_path = tooltip if os.path.isabs(tooltip) else os.path.abspath(tooltip)
+            # check under project root
+            under_project = abs_path.startswith(project_root)
+            # check exclusion patterns; the NUL byte keeps matches from spanning both fields
+            excluded = EXCLUDE_RE.search(label + b'\x00' + tooltip) is not None
+            if under_project and (not excluded):
+                keep_nodes.add(node_id)
+                f_out.write(line)
             continue
-    if in_body:
-        # collect everything; we'll split later
-        footer.append(line)
-
-# Actually split body into node and edge lines
-node_lines = []
-edge_lines = []
-other_lines = []
-
-for line in footer:
-    if node_re.match(line):
-        node_lines.append(line)
-    elif edge_re.match(line):
-        edge_lines.append(line)
-    else:
-        other_lines.append(line)
-
-# Process nodes: decide which to keep
-for nl in node_lines:
-    m = node_re.match(nl)
-    if not m:
-        continue
-    node_id = m.group('id')
-    tooltip = m.group('tooltip')
-    label = m.group('label') or ""
-    # normalize tooltip path
-    abs_path = tooltip
-    if not os.path.isabs(abs_path):
-        abs_path = os.path.abspath(abs_path)
-    # check under project root
-    under_project = abs_path.startswith(project_root)
-    # check exclusion patterns
-    excluded = any(p.search(label) or p.search(tooltip) for p in EXCLUDE_PATTERNS)
-    if under_project and (not excluded):
-        keep_nodes[node_id] = nl
 
-# Filter edges: only those where both src and dst are kept
-filtered_edges = []
-for el in edge_lines:
-    m = edge_re.match(el)
-    if not m:
-        continue
-    src, dst = m.group('src'), m.group('dst')
-    if src in keep_nodes and dst in keep_nodes:
-        filtered_edges.append(el)
+        m = edge_re.match(line)
+        if m:
+            in_body = True
+            src, dst = m.groups()
+            edges.append((src, dst, line))
+        elif in_body:
+            other_lines.append(line)
+        else:
+            f_out.write(line)
 
-# Write filtered DOT
-with open(out_dot, 'w') as f:
-    for l in header:
-        f.write(l)
-    # write kept nodes
-    for node_id, nl in keep_nodes.items():
-        f.write(nl)
-    # write edges
-    for e in filtered_edges:
-        f.write(e)
+    # write edges where both src and dst are kept
+    for src, dst, line in edges:
+        if src in keep_nodes and dst in keep_nodes:
+            f_out.write(line)
+            n_edges += 1
     # write other (non-node/edge) lines if any
-    for l in other_lines:
-        f.write(l)
+    for line in other_lines:
+        f_out.write(line)
 
 print(f"Filtered DOT written to {out_dot}")
-print(f"Nodes kept: {len(keep_nodes)}, edges kept: {len(filtered_edges)}")
+print(f"Nodes kept: {len(keep_nodes)}, edges kept: {n_edges}")
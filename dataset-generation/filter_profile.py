@@ -6,12 +6,12 @@ PROJECT_ROOT = '/home/jovyan/project/NeoQA/dataset-generation'  # adjust
 stats = pstats.Stats('myLog.profile')
 
 # filter out entries whose filename is not under PROJECT_ROOT
+# (trailing separator so that sibling dirs sharing the prefix are not matched)
+prefix = os.path.normpath(PROJECT_ROOT) + os.sep
 filtered = pstats.Stats()
-for func, func_stats in stats.stats.items():
-    filename = func[0]
-    # normalize paths (for comparison)
-    norm = os.path.normpath(filename)
-    if norm.startswith(os.path.normpath(PROJECT_ROOT)):
-        filtered.stats[func] = func_stats
+filtered.stats = {func: func_stats for func, func_stats in stats.stats.items()
+                  if os.path.normpath(func[0]).startswith(prefix)}
+# recompute the totals (total_calls, total_tt, ...) for the filtered entries
+filtered.get_top_level_stats()
 
 filtered.dump_stats('project_only.profile')
@@ -1,21 +1,32 @@
 # mock_prereqs.py - Combined Mock for NLI + Question Filter (Bypasses Both Steps)
 import argparse
-import json
 import random  # Optional: For realistic % fails/neutrals
 from pathlib import Path
 from typing import List, Dict
-from data_gen.util.file_util import read_json  # Your util (or json.load)
 from data_gen.util.ids import generate_id
 
+try:
+    from orjson import dumps as json_dumps, loads as json_loads
+except ImportError:  # orjson is optional, the stdlib encoder produces the same records
+    import json
+
+    def json_dumps(obj) -> bytes:
+        return json.dumps(obj).encode('utf-8')
+
+    json_loads = json.loads
+
 def idfy_news_articles(storyline_dir: Path):
     news_path = storyline_dir / "news-articles.json"
     idfy_path = storyline_dir / "news-articles-idfy.json"
-    articles = read_json(news_path)
+    # Re-runs reuse the idfied output unless the news articles changed since
+    if idfy_path.exists() and idfy_path.stat().st_mtime_ns >= news_path.stat().st_mtime_ns:
+        return idfy_path
+    articles = json_loads(news_path.read_bytes())
     for key in articles["articles"]:
         for article in articles["articles"][key]:
             article["article_id"] = generate_id(article)
-    with idfy_path.open("w") as f:
-        f.write(json.dumps(articles)+'\n')
+    with idfy_path.open("wb") as f:
+        f.write(json_dumps(articles) + b'\n')
     return idfy_path
 
 
@@ -29,7 +40,7 @@ def mock_nli(storyline_dir: Path, fail_pct: float = 0.0) -> Path:
         print(f"No news file in {news_path.parent} → Skipping NLI")
         return None
     
-    articles = read_json(news_path)
+    articles = json_loads(news_path.read_bytes())
     preds = []
     for event_articles in articles['articles'].values():
         for art in event_articles:
@@ -44,9 +55,8 @@ def mock_nli(storyline_dir: Path, fail_pct: float = 0.0) -> Path:
                 })
     
     out_path = storyline_dir / "nli-predictions.jsonl"
-    with out_path.open('w') as f:
-        for p in preds:
-            f.write(json.dumps(p) + '\n')
+    with out_path.open('wb') as f:
+        f.write(b'\n'.join(json_dumps(p) for p in preds) + b'\n')
     unsure_pct = sum(1 for p in preds if p['nli_prediction'] != 'entailment') / len(preds)
     print(f"Mocked {len(preds)} NLI ({unsure_pct:.1%} unsure) → {out_path}")
     return out_path
@@ -58,7 +68,7 @@ def mock_question_filter(q_dir: Path, fail_pct: float = 0.0) -> Path:
     for f_name in raw_files:
         f_path = q_dir / f_name
         if f_path.exists():
-            data = read_json(f_path)
+            data = json_loads(f_path.read_bytes())
             questions.extend(data.get('questions', []))
     
     if not questions:
@@ -71,9 +81,8 @@ def mock_question_filter(q_dir: Path, fail_pct: float = 0.0) -> Path:
         q['filter_reason'] = 'Mock: Valid' if is_success else 'Mock: Invalid (e.g., incoherent)'
     
     out_path = q_dir / 'filter-evaluated-outputs.jsonl'
-    with out_path.open('w') as f:
-        for q in questions:
-            f.write(json.dumps(q) + '\n')
+    with out_path.open('wb') as f:
+        f.write(b'\n'.join(json_dumps(q) for q in questions) + b'\n')
     
     success_pct = sum(1 for q in questions if q['filtered'] == 'success') / len(questions)
     print(f"Mocked {len(questions)} questions ({success_pct:.1%} success) → {out_path}")